@@ -0,0 +1,101 @@
+import asyncio
+
+import orjson
+
+import models
+from pdf_processor import PAPER_REQUEST, decode_json_object, paper_messages
+
+# The same model as the OpenRouter requests, named without its provider prefix
+BATCH_MODEL = PAPER_REQUEST["model"].removeprefix("openai/")
+
+# Seconds between batch status checks
+POLL_INTERVAL = 60
+
+# Statuses after which a batch no longer changes
+FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def build_batch_jsonl(texts, filenames):
+    """Batch API input: one chat completion request per paper, keyed by filename"""
+    return b"".join(
+        orjson.dumps(
+            {
+                "custom_id": filename,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    **PAPER_REQUEST,
+                    "model": BATCH_MODEL,
+                    "messages": paper_messages(text),
+                },
+            },
+            option=orjson.OPT_APPEND_NEWLINE,
+        )
+        for text, filename in zip(texts, filenames)
+    )
+
+
+def parse_batch_output(output, filenames):
+    """Decoded response per paper from Batch API output, or the exception"""
+    results = {}
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        entry = orjson.loads(line)
+        response = entry.get("response") or {}
+        try:
+            if response.get("status_code") != 200:
+                # Rejected requests carry the API error in the response body
+                error = entry.get("error") or (response.get("body") or {}).get("error")
+                raise Exception(f"Batch request failed: {error}")
+            content = response["body"]["choices"][0]["message"]["content"]
+            results[entry["custom_id"]] = decode_json_object(content)
+        except Exception as e:
+            results[entry["custom_id"]] = e
+
+    return [
+        results.get(filename, Exception("No result in batch output"))
+        for filename in filenames
+    ]
+
+
+async def request_batch_api(texts, filenames):
+    """Send the papers as one OpenAI batch and wait for it to finish
+
+    Batches cost half as much as individual requests and draw on a separate
+    rate limit, but may take up to 24 hours, so this suits offline runs.
+    Returns a dict or an exception per paper, like ``request_paper_infos``.
+    """
+    client = models.openai_batch_client
+    if client is None:
+        raise Exception("OPENAI_API_KEY must be set to use the Batch API")
+
+    input_file = await client.files.create(
+        file=("papers.jsonl", build_batch_jsonl(texts, filenames)), purpose="batch"
+    )
+    batch = await client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    print(f"   📤 Submitted batch {batch.id} with {len(texts)} papers")
+
+    while batch.status not in FINAL_STATUSES:
+        await asyncio.sleep(POLL_INTERVAL)
+        batch = await client.batches.retrieve(batch.id)
+        counts = batch.request_counts
+        done = f" ({counts.completed}/{counts.total})" if counts else ""
+        print(f"   ⏳ Batch {batch.id}: {batch.status}{done}")
+
+    # Expired or cancelled batches still return the requests that finished,
+    # and requests that failed are listed in a separate error file
+    file_ids = [
+        file_id for file_id in (batch.output_file_id, batch.error_file_id) if file_id
+    ]
+    if not file_ids:
+        raise Exception(f"Batch {batch.id} ended as {batch.status} with no output")
+
+    outputs = await asyncio.gather(*map(client.files.content, file_ids))
+    return parse_batch_output(
+        b"\n".join(output.content for output in outputs), filenames
+    )
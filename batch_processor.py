@@ -1,100 +1,220 @@
 import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+from functools import partial
 from pathlib import Path
 
-from pdf_processor import process_single_pdf, save_to_excel
-
-
-async def process_pdf_batch(pdf_files, batch_num, excel_output):
-    """Process a batch of PDF files concurrently with clean error handling"""
-    print(f"\n🔄 Batch {batch_num}: Processing {len(pdf_files)} files concurrently")
-
-    # Process all PDFs in the batch concurrently
-    tasks = [process_single_pdf(pdf_file) for pdf_file in pdf_files]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+from batch_api import request_batch_api
+from cpus import available_cpus
+from pdf_processor import (
+    PaperRecord,
+    collect_record,
+    flush_records,
+    limit_ocr_workers,
+    process_pdf_group,
+    read_sidecar,
+    request_paper_infos,
+)
+from rate_limiter import RateLimiter
+
+try:
+    import uvloop
+except ImportError:  # Optional faster event loop; not available on Windows
+    uvloop = None
+
+# Maximum number of PDFs open for text extraction at the same time
+MAX_OPEN_PDFS = 64
+
+
+async def process_tagged_group(pdf_group, group_sem, *args):
+    """Process a group of PDFs, pairing each file with its result or the exception"""
+    try:
+        async with group_sem or nullcontext():
+            results = await process_pdf_group(pdf_group, *args)
+        return list(zip(pdf_group, results))
+    except Exception as e:
+        return [(pdf_file, e) for pdf_file in pdf_group]
+
+
+async def process_pdf_batch(
+    pdf_files,
+    records,
+    sidecar,
+    api_sem,
+    fd_sem,
+    executor,
+    papers_per_request=1,
+    robust=True,
+    request=request_paper_infos,
+    group_sem=None,
+):
+    """Process PDF files concurrently with clean error handling
+
+    Records are appended to ``records`` as they complete, so the caller can
+    still save them if processing is interrupted. ``group_sem`` caps the
+    groups in progress, so extraction only runs a little ahead of requests.
+    """
+    print(f"\n🔄 Processing {len(pdf_files)} files concurrently")
+
+    # Process all PDF groups concurrently; the semaphores bound the actual load.
+    # Tasks are created here, in list order, so groups start largest first;
+    # as_completed would wrap bare coroutines in set order instead
+    tasks = [
+        asyncio.create_task(
+            process_tagged_group(
+                pdf_files[i : i + papers_per_request],
+                group_sem,
+                api_sem,
+                fd_sem,
+                executor,
+                robust,
+                request,
+            )
+        )
+        for i in range(0, len(pdf_files), papers_per_request)
+    ]
 
     successful = 0
     failed = 0
 
-    # Save results as they come in
-    for i, result in enumerate(results):
-        pdf_file = pdf_files[i]
-
-        if isinstance(result, Exception):
-            print(f"   ❌ {pdf_file.name}: Unexpected error - {result}")
-            # Clean empty record for unexpected errors
-            record = {
-                "filename": pdf_file.name,
-                "title": "",
-                "abstract": "",
-                "method": "",
-                "objectives": "",
-                "categories": [],
-                "summary": "",
-            }
-            failed += 1
-        else:
-            record, error = result
-            if error:
-                print(f"   ❌ {pdf_file.name}: {error}")
+    # Save results as they come in; Excel is written once processing is done
+    for next_group in asyncio.as_completed(tasks):
+        group_results = await next_group
+        # Papers of one group finish together and share a timestamp
+        processed_at = datetime.now().isoformat(sep=" ", timespec="seconds")
+        for pdf_file, result in group_results:
+            if isinstance(result, Exception):
+                print(f"   ❌ {pdf_file.name}: Unexpected error - {result}")
+                # Clean empty record for unexpected errors
+                record = PaperRecord(pdf_file.name)
                 failed += 1
             else:
-                print(f"   ✅ {pdf_file.name}: Success")
-                successful += 1
+                record, error = result
+                if error:
+                    print(f"   ❌ {pdf_file.name}: {error}")
+                    failed += 1
+                else:
+                    print(f"   ✅ {pdf_file.name}: Success")
+                    successful += 1
+
+            record.processed_at = processed_at
+            try:
+                await collect_record(record, records, sidecar)
+            except Exception as e:
+                print(f"   ⚠️  Failed to log {pdf_file.name} to sidecar: {e}")
 
-        # Save to Excel immediately
-        try:
-            await save_to_excel(record, excel_output)
-        except Exception as e:
-            print(f"   ⚠️  Failed to save {pdf_file.name} to Excel: {e}")
-
-    print(f"   📊 Batch {batch_num} Complete: {successful} success, {failed} failed")
     return successful, failed
 
 
+def list_pdfs_largest_first(papers_path):
+    """List PDFs in one directory scan, largest first so long jobs start early"""
+    with os.scandir(papers_path) as entries:
+        pdfs = [
+            (entry.stat().st_size, entry.path)
+            for entry in entries
+            if entry.name.endswith(".pdf") and entry.is_file()
+        ]
+    pdfs.sort(key=lambda pdf: pdf[0], reverse=True)
+    return [Path(path) for _, path in pdfs]
+
+
 async def batch_process_papers(
-    batch_size=10, papers_dir="papers", excel_output="batch_papers_summary.xlsx"
+    batch_size=10,
+    papers_dir="papers",
+    excel_output="batch_papers_summary.xlsx",
+    papers_per_request=1,
+    robust=True,
+    use_batch_api=False,
+    max_requests_per_minute=None,
+    max_tokens_per_minute=None,
 ):
-    """Main function to process papers in batches"""
+    """Main function to process papers with bounded OpenAI concurrency
+
+    papers_per_request > 1 sends several papers in one OpenAI request,
+    sharing the system prompt and HTTP round trip between them.
+    robust=False extracts text with PyMuPDF only, skipping the slower
+    fallbacks and OCR. use_batch_api=True sends every uncached paper as one
+    OpenAI batch at half the cost, waiting up to 24 hours for the results.
+    Setting either per-minute limit to the account's tier paces requests to
+    stay under it instead of retrying after rate limit errors.
+    """
 
     papers_path = Path(papers_dir)
     if not papers_path.exists():
         print(f"❌ Papers directory '{papers_dir}' not found!")
         return
 
-    pdf_files = list(papers_path.glob("*.pdf"))
+    pdf_files = list_pdfs_largest_first(papers_path)
     if not pdf_files:
         print(f"❌ No PDF files found in '{papers_dir}'")
         return
 
+    request = request_paper_infos
+    if max_requests_per_minute or max_tokens_per_minute:
+        limiter = RateLimiter(max_requests_per_minute, max_tokens_per_minute)
+        request = partial(request_paper_infos, limiter=limiter)
+    if use_batch_api:
+        # One group, so every uncached paper ends up in the same batch
+        papers_per_request = len(pdf_files)
+        request = request_batch_api
+
     print(f"🚀 Starting Batch Processing")
     print(f"📁 Found {len(pdf_files)} PDF files")
-    print(f"📦 Batch size: {batch_size}")
+    print(f"📦 Concurrent requests: {batch_size}")
+    print(f"📚 Papers per request: {papers_per_request}")
+    print(f"📮 OpenAI Batch API: {'yes' if use_batch_api else 'no'}")
+    print(f"🔍 Extraction: {'robust' if robust else 'fast (PyMuPDF only)'}")
     print(f"💾 Output: {excel_output}")
     print("=" * 50)
 
-    total_successful = 0
-    total_failed = 0
-
-    # Process in batches
-    for i in range(0, len(pdf_files), batch_size):
-        batch = pdf_files[i : i + batch_size]
-        batch_num = (i // batch_size) + 1
-
-        # Process batch
-        successful, failed = await process_pdf_batch(
-            batch, batch_num, Path(excel_output)
-        )
-        total_successful += successful
-        total_failed += failed
-
-        # Progress update
-        processed = min(i + batch_size, len(pdf_files))
-        progress = (processed / len(pdf_files)) * 100
-        print(f"📈 Progress: {processed}/{len(pdf_files)} ({progress:.1f}%)")
-
-        # Delay between batches
-        if i + batch_size < len(pdf_files):
-            await asyncio.sleep(2)
+    excel_path = Path(excel_output)
+    api_sem = asyncio.BoundedSemaphore(batch_size)
+    fd_sem = asyncio.BoundedSemaphore(MAX_OPEN_PDFS)
+    # Groups being sent plus one extracted group waiting per worker process:
+    # PDFs are parsed while earlier papers are with OpenAI, but not all upfront.
+    # Group tasks are created in list order and the semaphore wakes waiters in
+    # the order they arrived, so groups are admitted largest first
+    group_sem = asyncio.BoundedSemaphore(batch_size + available_cpus())
+
+    # Records logged by an earlier run that stopped before saving to Excel
+    sidecar_path = excel_path.with_suffix(".jsonl")
+    records = read_sidecar(sidecar_path) if sidecar_path.exists() else []
+    if records:
+        print(f"♻️  Recovered {len(records)} unsaved records from {sidecar_path}")
+
+    try:
+        # PDF parsing is CPU-bound, so run it in worker processes. The pool
+        # already uses every CPU, so each worker OCRs its pages one at a time
+        with (
+            ProcessPoolExecutor(
+                max_workers=available_cpus(),
+                initializer=limit_ocr_workers,
+                initargs=(1,),
+            ) as pdf_pool,
+            open(sidecar_path, "ab") as sidecar,
+        ):
+            total_successful, total_failed = await process_pdf_batch(
+                pdf_files,
+                records,
+                sidecar,
+                api_sem,
+                fd_sem,
+                pdf_pool,
+                papers_per_request,
+                robust,
+                request,
+                group_sem,
+            )
+    finally:
+        # Write every record to Excel in one pass, even after an interruption
+        try:
+            flush_records(records, excel_path)
+            # Every logged record is in the workbook now
+            sidecar_path.unlink(missing_ok=True)
+        except Exception as e:
+            print(f"⚠️  Failed to save results to Excel: {e}")
 
     # Final summary
     print("\n" + "=" * 50)
@@ -112,6 +232,12 @@ if __name__ == "__main__":
     BATCH_SIZE = 10
     PAPERS_DIR = "papers"
     EXCEL_OUTPUT = "batch_papers_summary.xlsx"
+    USE_BATCH_API = False  # Half-price OpenAI batch, needs OPENAI_API_KEY
 
-    # Start processing
-    asyncio.run(batch_process_papers(BATCH_SIZE, PAPERS_DIR, EXCEL_OUTPUT))
+    # Start processing, on uvloop when it is installed
+    run = uvloop.run if uvloop else asyncio.run
+    run(
+        batch_process_papers(
+            BATCH_SIZE, PAPERS_DIR, EXCEL_OUTPUT, use_batch_api=USE_BATCH_API
+        )
+    )
@@ -2,41 +2,45 @@ import json
 import re
 from collections import Counter
 
+import numpy as np
 import pandas as pd
 
+from summary_data import parse_categories, read_summary
+
+
+def top_codes(counts, n):
+    """Indices of the n largest counts, ties broken by first appearance"""
+    n = min(n, len(counts))
+    if n == 0:
+        return np.array([], dtype=np.intp)
+    threshold = counts[np.argpartition(-counts, n - 1)[n - 1]]
+    candidates = np.flatnonzero(counts >= threshold)
+    return candidates[np.lexsort((candidates, -counts[candidates]))][:n]
+
 
 def analyze_categories(excel_file="batch_papers_summary.xlsx"):
     """Analyze all categories and suggest grouping strategy"""
 
     try:
-        df = pd.read_excel(excel_file)
+        df = read_summary(excel_file)
 
         print("🔍 COMPREHENSIVE CATEGORY ANALYSIS")
         print("=" * 60)
 
-        # Extract all categories
-        all_categories = []
-        for cats in df["categories"].dropna():
-            if isinstance(cats, str):
-                try:
-                    # Handle different formats
-                    if cats.startswith("["):
-                        cat_list = eval(cats)
-                    else:
-                        cat_list = [cats]
-                    all_categories.extend(cat_list)
-                except:
-                    all_categories.append(cats)
-
-        # Clean and normalize categories
-        cleaned_categories = []
-        for cat in all_categories:
-            # Remove extra spaces, normalize case
-            cleaned_cat = str(cat).strip().lower()
-            cleaned_categories.append(cleaned_cat)
-
-        category_counts = Counter(cleaned_categories)
-        total_categories = len(category_counts)
+        # Extract all categories, flattening list cells into one row each
+        categories = df["categories"].dropna()
+        categories = categories[categories.map(lambda cats: isinstance(cats, str))]
+        parsed = categories.map(parse_categories)
+        parsed = parsed[parsed.str.len() > 0]
+
+        # Clean and normalize categories: remove extra spaces, normalize case
+        all_categories = parsed.explode().astype(str).str.strip().str.lower()
+
+        # Integer codes follow first appearance, so counts come from one bincount
+        codes, uniques = pd.factorize(all_categories, sort=False)
+        uniques = pd.Series(uniques)
+        counts = np.bincount(codes, minlength=len(uniques))
+        total_categories = len(uniques)
 
         print(f"📊 Total unique categories: {total_categories}")
         print(f"📈 Total category mentions: {len(all_categories)}")
@@ -44,7 +48,8 @@ def analyze_categories(excel_file="batch_papers_summary.xlsx"):
 
         print(f"\n🏆 TOP 30 CATEGORIES:")
         print("-" * 40)
-        for i, (cat, count) in enumerate(category_counts.most_common(30), 1):
+        for i, code in enumerate(top_codes(counts, 30), 1):
+            cat, count = uniques[code], int(counts[code])
             percentage = (count / len(all_categories)) * 100
             print(f"{i:2d}. {cat:<35} | {count:3d} ({percentage:4.1f}%)")
 
@@ -126,22 +131,28 @@ def analyze_categories(excel_file="batch_papers_summary.xlsx"):
             ],
         }
 
-        # Categorize each category into research areas
-        area_counts = {area: 0 for area in research_areas}
-        categorized_items = {area: [] for area in research_areas}
-        uncategorized = []
+        # One alternation regex per area scans each category in a single pass
+        area_patterns = {
+            area: re.compile("|".join(re.escape(keyword) for keyword in keywords))
+            for area, keywords in research_areas.items()
+        }
+
+        # Categorize each category into the first research area it matches
+        area_counts = {}
+        categorized_items = {}
+        unassigned = np.ones(total_categories, dtype=np.bool_)
 
-        for cat, count in category_counts.items():
-            categorized = False
-            for area, keywords in research_areas.items():
-                if any(keyword in cat for keyword in keywords):
-                    area_counts[area] += count
-                    categorized_items[area].append((cat, count))
-                    categorized = True
-                    break
+        for area, pattern in area_patterns.items():
+            mask = uniques.str.contains(pattern).to_numpy() & unassigned
+            unassigned &= ~mask
+            area_counts[area] = int(counts[mask].sum())
+            categorized_items[area] = [
+                (uniques[code], int(counts[code])) for code in np.flatnonzero(mask)
+            ]
 
-            if not categorized:
-                uncategorized.append((cat, count))
+        uncategorized = [
+            (uniques[code], int(counts[code])) for code in np.flatnonzero(unassigned)
+        ]
 
         print("\n📊 SUGGESTED RESEARCH AREA GROUPINGS:")
         print("=" * 50)
@@ -218,7 +229,7 @@ def analyze_categories(excel_file="batch_papers_summary.xlsx"):
 
         return {
             "total_categories": total_categories,
-            "category_counts": category_counts,
+            "category_counts": Counter(dict(zip(uniques, counts.tolist()))),
             "research_areas": area_counts,
             "recommended_structure": recommended_structure,
             "categorized_items": categorized_items,
@@ -231,5 +242,3 @@ def analyze_categories(excel_file="batch_papers_summary.xlsx"):
 
 if __name__ == "__main__":
     result = analyze_categories()
-if __name__ == "__main__":
-    result = analyze_categories()
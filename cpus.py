@@ -0,0 +1,9 @@
+import os
+
+
+def available_cpus():
+    """CPUs this process may run on, which can be fewer than the machine has"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS and Windows
+        return os.cpu_count() or 1
@@ -1,9 +1,57 @@
+import hashlib
+import io
 import json
 import os
 from datetime import datetime
 from pathlib import Path
 
-import pandas as pd
+from summary_data import read_summary, summary_exists
+
+# Columns of the processed summary used for references
+SUMMARY_COLUMNS = ['filename', 'title', 'abstract', 'method', 'objectives', 'summary', 'categories', 'processed_at']
+
+# Fingerprint of the inputs the reference files were last built from
+MANIFEST_FILE = Path(".references.cache")
+
+
+# Usage notes appended to the end of the references file
+USAGE_INSTRUCTIONS = f"""
+{"=" * 80}
+USAGE INSTRUCTIONS FOR FINAL DOCUMENT
+{"=" * 80}
+
+1. CITATION FORMATS:
+   - In-text: (Author et al., Year) or [1], [2], etc.
+   - Bibliography: Use the filename as reference identifier
+
+2. REFERENCE LIST:
+   - Copy relevant references to your bibliography section
+   - Format according to your required citation style (APA, IEEE, etc.)
+
+3. IN-TEXT CITATIONS:
+   - Use [REF001], [REF002], etc. for numbered citations
+   - Or use (Author et al., Year) format if you extract author names
+
+4. BIBLIOGRAPHY ENTRY EXAMPLE:
+   [REF001] Filename.pdf - Title if available
+   [REF002] Filename.pdf - Title if available
+
+5. FOR FULL PAPER ANALYSIS:
+   - Use the categorized summaries in 'categorized_papers/' folder
+   - Each category has combined summaries for comprehensive analysis
+   - Use the AI prompts in 'report_prompts/' folder for report generation
+"""
+
+
+def references_manifest_key(pdf_files, excel_file, output_file):
+    """Fingerprint of the papers and processed summary the references are built from"""
+    summary_path = Path(excel_file)
+    inputs = [output_file]
+    for path in sorted(pdf_files) + [summary_path, summary_path.with_suffix('.parquet')]:
+        if path.exists():
+            stat = path.stat()
+            inputs.append([path.name, stat.st_mtime_ns, stat.st_size])
+    return hashlib.sha256(json.dumps(inputs).encode()).hexdigest()
 
 
 def create_references_file(papers_dir="papers", output_file="paper_references.txt"):
@@ -22,138 +70,123 @@ def create_references_file(papers_dir="papers", output_file="paper_references.tx
         return
     
     print(f"📁 Found {len(pdf_files)} PDF files")
+    
+    excel_file = "batch_papers_summary.xlsx"
+    numbered_file = "numbered_references.txt"
+    
+    # Nothing to rebuild when neither the papers nor the summary changed
+    manifest_key = references_manifest_key(pdf_files, excel_file, output_file)
+    if (MANIFEST_FILE.exists() and MANIFEST_FILE.read_text() == manifest_key
+            and Path(output_file).exists() and Path(numbered_file).exists()):
+        print(f"♻️  Papers and processed data unchanged, keeping {output_file}")
+        return len(pdf_files)
+    
     print(f"📝 Creating references file: {output_file}")
     
     # Check if we have processed data from batch_processor
-    excel_file = "batch_papers_summary.xlsx"
     processed_data = {}
     
-    if Path(excel_file).exists():
+    if summary_exists(excel_file):
         try:
-            df = pd.read_excel(excel_file)
+            df = read_summary(excel_file, columns=SUMMARY_COLUMNS)
             print(f"✅ Found processed data for {len(df)} papers")
             
-            # Create a mapping from filename to processed data
-            for _, row in df.iterrows():
-                if pd.notna(row['filename']):
-                    processed_data[row['filename']] = {
-                        'title': row['title'] if pd.notna(row['title']) else '',
-                        'abstract': row['abstract'] if pd.notna(row['abstract']) else '',
-                        'method': row['method'] if pd.notna(row['method']) else '',
-                        'objectives': row['objectives'] if pd.notna(row['objectives']) else '',
-                        'summary': row['summary'] if pd.notna(row['summary']) else '',
-                        'categories': row['categories'] if pd.notna(row['categories']) else '',
-                        'processed_at': row['processed_at'] if pd.notna(row['processed_at']) else ''
-                    }
+            # Create a mapping from filename to processed data; later rows win
+            fields = SUMMARY_COLUMNS[1:]
+            df = df.dropna(subset=['filename']).drop_duplicates('filename', keep='last')
+            df = df.fillna({field: '' for field in fields})
+            processed_data = df.set_index('filename')[fields].to_dict(orient='index')
         except Exception as e:
             print(f"⚠️  Could not read processed data: {e}")
     
     # Create references file
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("PAPER REFERENCES FOR FINAL DOCUMENT\n")
-        f.write("=" * 80 + "\n\n")
-        f.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"Total papers: {len(pdf_files)}\n\n")
+    buf = io.StringIO()
+    buf.write("PAPER REFERENCES FOR FINAL DOCUMENT\n")
+    buf.write("=" * 80 + "\n\n")
+    buf.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    buf.write(f"Total papers: {len(pdf_files)}\n\n")
+    
+    # Write references in different formats
+    buf.write("REFERENCE FORMATS:\n")
+    buf.write("-" * 40 + "\n\n")
+    
+    reference_rule = "-" * 60 + "\n"
+    for i, pdf_file in enumerate(pdf_files, 1):
+        filename = pdf_file.name
         
-        # Write references in different formats
-        f.write("REFERENCE FORMATS:\n")
-        f.write("-" * 40 + "\n\n")
+        # Try to get processed data
+        if filename in processed_data:
+            data = processed_data[filename]
+            title = data['title'] if data['title'] and data['title'] != filename else "Title not extracted"
+            abstract = data['abstract'] if data['abstract'] and 'error' not in str(data['abstract']).lower() else "Abstract not available"
+            method = data['method'] if data['method'] and 'error' not in str(data['method']).lower() else "Method not available"
+            categories = data['categories'] if data['categories'] else "Categories not available"
+        else:
+            title = "Title not extracted"
+            abstract = "Abstract not available"
+            method = "Method not available"
+            categories = "Categories not available"
         
-        for i, pdf_file in enumerate(pdf_files, 1):
-            filename = pdf_file.name
-            
-            # Try to get processed data
-            if filename in processed_data:
-                data = processed_data[filename]
-                title = data['title'] if data['title'] and data['title'] != filename else "Title not extracted"
-                abstract = data['abstract'] if data['abstract'] and 'error' not in str(data['abstract']).lower() else "Abstract not available"
-                method = data['method'] if data['method'] and 'error' not in str(data['method']).lower() else "Method not available"
-                categories = data['categories'] if data['categories'] else "Categories not available"
-            else:
-                title = "Title not extracted"
-                abstract = "Abstract not available"
-                method = "Method not available"
-                categories = "Categories not available"
-            
-            f.write(f"REFERENCE {i:03d}: {filename}\n")
-            f.write("-" * 60 + "\n")
-            
-            # Format 1: Simple filename reference
-            f.write(f"Filename: {filename}\n")
-            
-            # Format 2: Title reference (if available)
-            if title and title != filename and 'error' not in str(title).lower():
-                f.write(f"Title: {title}\n")
-            
-            # Format 3: Categories (if available)
-            if categories and categories != "Categories not available":
-                f.write(f"Categories: {categories}\n")
-            
-            # Format 4: Abstract snippet (if available)
-            if abstract and abstract != "Abstract not available" and 'error' not in str(abstract).lower():
-                # Truncate abstract to reasonable length
-                abstract_text = str(abstract)
-                if len(abstract_text) > 200:
-                    abstract_text = abstract_text[:200] + "..."
-                f.write(f"Abstract: {abstract_text}\n")
-            
-            # Format 5: Method snippet (if available)
-            if method and method != "Method not available" and 'error' not in str(method).lower():
-                method_text = str(method)
-                if len(method_text) > 150:
-                    method_text = method_text[:150] + "..."
-                f.write(f"Method: {method_text}\n")
-            
-            f.write("\n")
+        buf.write(f"REFERENCE {i:03d}: {filename}\n")
+        buf.write(reference_rule)
         
-        # Add usage instructions
-        f.write("\n" + "=" * 80 + "\n")
-        f.write("USAGE INSTRUCTIONS FOR FINAL DOCUMENT\n")
-        f.write("=" * 80 + "\n\n")
+        # Format 1: Simple filename reference
+        buf.write(f"Filename: {filename}\n")
         
-        f.write("1. CITATION FORMATS:\n")
-        f.write("   - In-text: (Author et al., Year) or [1], [2], etc.\n")
-        f.write("   - Bibliography: Use the filename as reference identifier\n\n")
+        # Format 2: Title reference (if available)
+        if title and title != filename and 'error' not in str(title).lower():
+            buf.write(f"Title: {title}\n")
         
-        f.write("2. REFERENCE LIST:\n")
-        f.write("   - Copy relevant references to your bibliography section\n")
-        f.write("   - Format according to your required citation style (APA, IEEE, etc.)\n\n")
+        # Format 3: Categories (if available)
+        if categories and categories != "Categories not available":
+            buf.write(f"Categories: {categories}\n")
         
-        f.write("3. IN-TEXT CITATIONS:\n")
-        f.write("   - Use [REF001], [REF002], etc. for numbered citations\n")
-        f.write("   - Or use (Author et al., Year) format if you extract author names\n\n")
+        # Format 4: Abstract snippet (if available)
+        if abstract and abstract != "Abstract not available" and 'error' not in str(abstract).lower():
+            # Truncate abstract to reasonable length
+            abstract_text = str(abstract)
+            if len(abstract_text) > 200:
+                abstract_text = abstract_text[:200] + "..."
+            buf.write(f"Abstract: {abstract_text}\n")
         
-        f.write("4. BIBLIOGRAPHY ENTRY EXAMPLE:\n")
-        f.write("   [REF001] Filename.pdf - Title if available\n")
-        f.write("   [REF002] Filename.pdf - Title if available\n\n")
+        # Format 5: Method snippet (if available)
+        if method and method != "Method not available" and 'error' not in str(method).lower():
+            method_text = str(method)
+            if len(method_text) > 150:
+                method_text = method_text[:150] + "..."
+            buf.write(f"Method: {method_text}\n")
         
-        f.write("5. FOR FULL PAPER ANALYSIS:\n")
-        f.write("   - Use the categorized summaries in 'categorized_papers/' folder\n")
-        f.write("   - Each category has combined summaries for comprehensive analysis\n")
-        f.write("   - Use the AI prompts in 'report_prompts/' folder for report generation\n")
+        buf.write("\n")
+    
+    # Add usage instructions
+    buf.write(USAGE_INSTRUCTIONS)
+    
+    Path(output_file).write_text(buf.getvalue(), encoding='utf-8')
     
     print(f"✅ References file created: {output_file}")
     print(f"📊 Total references: {len(pdf_files)}")
     
     # Also create a simple numbered list
-    numbered_file = "numbered_references.txt"
-    with open(numbered_file, 'w', encoding='utf-8') as f:
-        f.write("NUMBERED REFERENCES FOR CITATIONS\n")
-        f.write("=" * 50 + "\n\n")
-        
-        for i, pdf_file in enumerate(pdf_files, 1):
-            filename = pdf_file.name
-            if filename in processed_data:
-                title = processed_data[filename]['title']
-                if title and title != filename and 'error' not in str(title).lower():
-                    f.write(f"[{i:03d}] {title}\n")
-                else:
-                    f.write(f"[{i:03d}] {filename}\n")
+    buf = io.StringIO()
+    buf.write("NUMBERED REFERENCES FOR CITATIONS\n")
+    buf.write("=" * 50 + "\n\n")
+    
+    for i, pdf_file in enumerate(pdf_files, 1):
+        filename = pdf_file.name
+        if filename in processed_data:
+            title = processed_data[filename]['title']
+            if title and title != filename and 'error' not in str(title).lower():
+                buf.write(f"[{i:03d}] {title}\n")
             else:
-                f.write(f"[{i:03d}] {filename}\n")
+                buf.write(f"[{i:03d}] {filename}\n")
+        else:
+            buf.write(f"[{i:03d}] {filename}\n")
+    Path(numbered_file).write_text(buf.getvalue(), encoding='utf-8')
     
     print(f"✅ Numbered references file created: {numbered_file}")
     
+    MANIFEST_FILE.write_text(manifest_key)
+    
     return len(pdf_files)
 
 if __name__ == "__main__":
@@ -173,5 +206,3 @@ if __name__ == "__main__":
         print(f"   • Reference specific papers in your report")
     else:
         print("❌ No papers found to process")
-    else:
-        print("❌ No papers found to process")
@@ -1,17 +1,23 @@
 import json
-from collections import Counter
+import re
 
-import matplotlib.pyplot as plt
-import pandas as pd
-import seaborn as sns
+from summary_data import parse_categories, read_summary
+
+# Summaries written for papers that failed extraction or parsing
+ERROR_PATTERN = re.compile(
+    "|".join(
+        map(re.escape, ["Error", "Failed", "processing failed", "JSON parsing failed"])
+    ),
+    re.IGNORECASE,
+)
 
 
 def analyze_excel_data(excel_file="batch_papers_summary.xlsx"):
     """Analyze the Excel file to understand the data structure and content"""
 
     try:
-        # Read the Excel file
-        df = pd.read_excel(excel_file)
+        # Read the summary (Parquet copy when it is up to date)
+        df = read_summary(excel_file)
 
         print("🔍 EXCEL FILE ANALYSIS")
         print("=" * 50)
@@ -30,20 +36,17 @@ def analyze_excel_data(excel_file="batch_papers_summary.xlsx"):
             print(f"  - Null values: {df[col].isna().sum()}")
 
             if col == "categories":
-                # Analyze categories
-                all_categories = []
-                for cats in df[col].dropna():
-                    if isinstance(cats, str):
-                        try:
-                            cat_list = eval(cats) if cats.startswith("[") else [cats]
-                            all_categories.extend(cat_list)
-                        except:
-                            all_categories.append(cats)
-
-                category_counts = Counter(all_categories)
+                # Analyze categories, ties keep first-seen order like Counter
+                cats = df[col].dropna()
+                all_categories = cats[cats.map(type) == str].map(parse_categories)
+                category_counts = (
+                    all_categories.explode()
+                    .value_counts(sort=False)
+                    .sort_values(ascending=False, kind="stable")
+                )
                 print(f"  - Unique categories: {len(category_counts)}")
                 print(f"  - Top 10 categories:")
-                for cat, count in category_counts.most_common(10):
+                for cat, count in category_counts.head(10).items():
                     print(f"    • {cat}: {count}")
 
             elif col in ["title", "abstract", "method", "objectives", "summary"]:
@@ -61,18 +64,7 @@ def analyze_excel_data(excel_file="batch_papers_summary.xlsx"):
         print("-" * 35)
 
         # Check for processing errors
-        error_indicators = [
-            "Error",
-            "Failed",
-            "processing failed",
-            "JSON parsing failed",
-        ]
-        error_count = 0
-
-        for indicator in error_indicators:
-            error_count += (
-                df["summary"].str.contains(indicator, case=False, na=False).sum()
-            )
+        error_count = int(df["summary"].str.contains(ERROR_PATTERN, na=False).sum())
 
         print(f"📈 Successfully processed papers: {len(df) - error_count}")
         print(f"❌ Papers with errors: {error_count}")
@@ -92,5 +84,3 @@ def analyze_excel_data(excel_file="batch_papers_summary.xlsx"):
 
 if __name__ == "__main__":
     df = analyze_excel_data()
-if __name__ == "__main__":
-    df = analyze_excel_data()
@@ -1,6 +1,7 @@
 import os
 
 import dotenv
+import httpx
 import openai
 
 dotenv.load_dotenv()
@@ -10,3 +11,23 @@ client = openai.OpenAI(
     api_key=os.getenv("OPENROUTER_API_KEY"),
     base_url="https://openrouter.ai/api/v1",
 )
+
+# Async client so concurrent requests do not block the event loop. All
+# requests share one connection pool, multiplexed over HTTP/2, so they do
+# not each pay for a TCP and TLS handshake.
+async_client = openai.AsyncOpenAI(
+    api_key=os.getenv("OPENROUTER_API_KEY"),
+    base_url="https://openrouter.ai/api/v1",
+    http_client=openai.DefaultAsyncHttpxClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+        timeout=httpx.Timeout(600.0, connect=5.0),
+    ),
+)
+
+# Direct OpenAI client for the Batch API, which OpenRouter does not offer
+openai_batch_client = (
+    openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    if os.getenv("OPENAI_API_KEY")
+    else None
+)
@@ -1,238 +1,806 @@
 import asyncio
+import hashlib
 import io
 import json
-from datetime import datetime
+import mmap
+import os
+import random
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass, field
+from functools import cache, partial
 from pathlib import Path
 
 import fitz  # PyMuPDF
-import pandas as pd
-
-# Additional imports for better extraction
-import pdfplumber
-import PyPDF2
-import pytesseract
-from pdfminer.high_level import extract_text as pdfminer_extract_text
-from PIL import Image
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+import tiktoken
+import xlsxwriter
+from openpyxl import load_workbook
 
 import models
+from cpus import available_cpus
+
+# Column order of the summary workbook read by the analysis scripts
+EXCEL_COLUMNS = (
+    "title",
+    "abstract",
+    "method",
+    "objectives",
+    "categories",
+    "summary",
+    "filename",
+    "processed_at",
+)
+
+
+@dataclass(slots=True)
+class PaperRecord:
+    """Extracted information for one paper; all-empty fields mark a failure"""
+
+    filename: str
+    title: str = ""
+    abstract: str = ""
+    method: str = ""
+    objectives: str = ""
+    categories: list = field(default_factory=list)
+    summary: str = ""
+    processed_at: str = ""
+
+
+# Fields the model fills in for each paper
+PAPER_FIELDS = ("title", "abstract", "method", "objectives", "categories", "summary")
+
+# Structured output schema for a single paper's extracted information
+PAPER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string", "description": "Paper title"},
+        "abstract": {"type": "string", "description": "Paper abstract"},
+        "method": {"type": "string", "description": "Proposed method"},
+        "objectives": {"type": "string", "description": "Research objectives"},
+        "categories": {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "Keywords from abstract",
+        },
+        "summary": {
+            "type": "string",
+            "description": "Comprehensive summary covering: problem addressed, main contributions, methodology, key findings, practical applications, significance, and future implications. Include technical details, algorithms, datasets, performance metrics (300-500 words).",
+        },
+    },
+    "required": [
+        "title",
+        "abstract",
+        "method",
+        "objectives",
+        "categories",
+        "summary",
+    ],
+    "additionalProperties": False,
+}
+
+# Schema of a response covering several papers, one entry per document
+BATCH_SCHEMA = {
+    "type": "object",
+    "properties": {"papers": {"type": "array", "items": PAPER_SCHEMA}},
+    "required": ["papers"],
+    "additionalProperties": False,
+}
+
+# response_format arguments, built once instead of on every request attempt
+PAPER_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "paper_analysis",
+        "description": "Structured paper information extraction",
+        "schema": PAPER_SCHEMA,
+        "strict": True,
+    },
+}
+
+BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "paper_analysis_batch",
+        "description": "Structured information for several papers",
+        "schema": BATCH_SCHEMA,
+        "strict": True,
+    },
+}
+
+JSON_DECODER = json.JSONDecoder()
+
+# On-disk cache of extracted text and OpenAI responses, keyed by content hash
+CACHE_DIR = Path(".cache")
+
+# Model used for extraction, part of the response cache key
+MODEL = "openai/gpt-4o-mini"
+
+# Bump whenever the extraction prompt or schema changes to invalidate responses
+PROMPT_VERSION = "2"
+
+# Token budget for the paper text sent to the model. The head of a paper
+# (title, abstract, introduction, method) holds what the schema asks for,
+# while the tail is mostly references.
+MAX_INPUT_TOKENS = 12000
+
+# Extraction stops after this many characters. Tokens average about four
+# characters, so this keeps twice the input budget and skips the pages
+# that could never be sent.
+MAX_EXTRACT_CHARS = MAX_INPUT_TOKENS * 8
+
+# PyMuPDF "text" flags: expand ligatures and join words hyphenated across
+# lines, so the model sees clean words in fewer tokens
+PYMUPDF_TEXT_FLAGS = (
+    fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_MEDIABOX_CLIP | fitz.TEXT_DEHYPHENATE
+)
+
+# Bump whenever extraction output changes (PyMuPDF flags, MAX_EXTRACT_CHARS,
+# OCR pages or rendering) so text cached by earlier versions is not reused
+EXTRACTION_VERSION = "2"
+
+# Heading of the reference list on a line of its own, optionally numbered
+REFERENCES_HEADING = re.compile(
+    r"^[ \t]*(?:\d+\.?[ \t]*)?(?:references|bibliography|literature cited)[ \t]*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# Cap on the response length per paper: the abstract and a 300-500 word
+# summary with room to spare, so a runaway response cannot burn the budget
+MAX_OUTPUT_TOKENS = 2000
+
+# Most output tokens the model can produce in one response
+MODEL_MAX_OUTPUT_TOKENS = 16384
+
+# Fixed sampling seed; with temperature 0 the same text gets the same answer
+SEED = 42
+
+# System messages are constant so every request starts with the same prefix,
+# which OpenAI caches; the paper text always comes last
+SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "You are a scientific paper analysis assistant. If information is not available, use empty string for text fields and empty array for categories.",
+}
+
+BATCH_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "You are a scientific paper analysis assistant. You will receive numbered documents separated by ---. Return one entry in papers per document, in the same order. If information is not available, use empty string for text fields and empty array for categories.",
+}
+
+# Request options for a single paper, shared by every way of sending one
+PAPER_REQUEST = {
+    "model": MODEL,
+    "temperature": 0,
+    "seed": SEED,
+    "max_tokens": MAX_OUTPUT_TOKENS,
+    "response_format": PAPER_RESPONSE_FORMAT,
+}
+
+
+def read_cache(kind, key):
+    """Return the cached value for key, or None on a cache miss"""
+    cache_file = CACHE_DIR / kind / key
+    if cache_file.exists():
+        return cache_file.read_text(encoding="utf-8")
+    return None
+
+
+def write_cache(kind, key, value):
+    """Store value under key, writing atomically so readers never see partial files"""
+    cache_file = CACHE_DIR / kind / key
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+    tmp_file.write_text(value, encoding="utf-8")
+    os.replace(tmp_file, cache_file)
+
+
+def response_cache_key(text):
+    """Cache key for a model response: the paper text, prompt version and model"""
+    return (
+        hashlib.sha256(f"{text}{PROMPT_VERSION}{MODEL}".encode()).hexdigest() + ".json"
+    )
+
+
+@cache
+def token_encoding():
+    """Tokenizer of the extraction model, or None when it cannot be loaded"""
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"   ⚠️  Tokenizer unavailable, truncating by characters: {e}")
+        return None
 
 
-async def extract_text_from_pdf_robust(pdf_path):
-    """Robust PDF text extraction with multiple methods and OCR fallback"""
+def count_tokens(text):
+    """Number of tokens in text, estimated from its length without a tokenizer"""
+    encoding = token_encoding()
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text, disallowed_special=()))
 
-    print(f"   🔍 Trying multiple extraction methods for {pdf_path.name}")
 
-    # Method 1: PyMuPDF (current method - fast and usually good)
-    try:
-        doc = fitz.open(pdf_path)
-        text_parts = []
-        for page in doc:
-            text = page.get_text()
-            if text.strip():
-                text_parts.append(text)
-        doc.close()
-
-        full_text = "\n".join(text_parts)
-        if len(full_text.strip()) > 100:  # Good extraction
-            print(f"   ✅ PyMuPDF extraction successful: {len(full_text)} chars")
-            return full_text
-        else:
-            print(f"   ⚠️  PyMuPDF extracted minimal text: {len(full_text)} chars")
-    except Exception as e:
-        print(f"   ❌ PyMuPDF failed: {e}")
+def truncate_tokens(text, max_tokens=MAX_INPUT_TOKENS):
+    """Keep the first max_tokens tokens of text"""
+    encoding = token_encoding()
+    if encoding is None:
+        # Roughly four characters per token for English text
+        return text[: max_tokens * 4]
 
-    # Method 2: pdfplumber (better for complex layouts)
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            text_parts = []
-            for page in pdf.pages:
-                text = page.extract_text()
-                if text and text.strip():
-                    text_parts.append(text)
-
-        full_text = "\n".join(text_parts)
-        if len(full_text.strip()) > 100:
-            print(f"   ✅ pdfplumber extraction successful: {len(full_text)} chars")
-            return full_text
-        else:
-            print(f"   ⚠️  pdfplumber extracted minimal text: {len(full_text)} chars")
-    except Exception as e:
-        print(f"   ❌ pdfplumber failed: {e}")
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
 
-    # Method 3: PDFMiner (good for complex PDFs)
-    try:
-        full_text = pdfminer_extract_text(str(pdf_path))
-        if len(full_text.strip()) > 100:
-            print(f"   ✅ PDFMiner extraction successful: {len(full_text)} chars")
-            return full_text
-        else:
-            print(f"   ⚠️  PDFMiner extracted minimal text: {len(full_text)} chars")
-    except Exception as e:
-        print(f"   ❌ PDFMiner failed: {e}")
 
-    # Method 4: PyPDF2 (lightweight fallback)
-    try:
-        with open(pdf_path, "rb") as file:
-            reader = PyPDF2.PdfReader(file)
-            text_parts = []
-            for page in reader.pages:
-                text = page.extract_text()
-                if text and text.strip():
-                    text_parts.append(text)
-
-        full_text = "\n".join(text_parts)
-        if len(full_text.strip()) > 100:
-            print(f"   ✅ PyPDF2 extraction successful: {len(full_text)} chars")
-            return full_text
-        else:
-            print(f"   ⚠️  PyPDF2 extracted minimal text: {len(full_text)} chars")
-    except Exception as e:
-        print(f"   ❌ PyPDF2 failed: {e}")
+def strip_references(text):
+    """Drop the reference list, which costs tokens but says nothing the schema needs
+
+    Only a heading in the second half of the text is trusted, so a table of
+    contents entry near the start never cuts the paper short.
+    """
+    last_heading = None
+    for last_heading in REFERENCES_HEADING.finditer(text):
+        pass
+    if last_heading is None or last_heading.start() < len(text) // 2:
+        return text
+    return text[: last_heading.start()]
+
+
+def extract_prompt_text(pdf_path, robust=True):
+    """Extracted text of a PDF without references, cut to the model's input budget"""
+    return truncate_tokens(strip_references(extract_text_cached(pdf_path, robust)))
+
+
+def join_page_texts(page_texts, max_chars=MAX_EXTRACT_CHARS):
+    """Join the non-blank page texts with newlines, streamed into one buffer
+
+    Stops pulling pages once ``max_chars`` are collected, so lazily extracted
+    pages past that point are never parsed.
+    """
+    buf = io.StringIO()
+    for text in page_texts:
+        if text and text.strip():
+            if buf.tell():
+                buf.write("\n")
+            buf.write(text)
+            if buf.tell() >= max_chars:
+                break
+    return buf.getvalue()
+
+
+def extract_with_pymupdf(doc):
+    """PyMuPDF extraction from an open document (fast and usually good)"""
+    # Plain "text" mode keeps paragraph breaks and skips layout dicts
+    return join_page_texts(
+        page.get_text("text", flags=PYMUPDF_TEXT_FLAGS) for page in doc
+    )
+
+
+def extract_with_pdfplumber(pdf_path):
+    """pdfplumber extraction (better for complex layouts)"""
+    import pdfplumber
 
-    # Method 5: OCR with Tesseract (for scanned PDFs)
+    with pdfplumber.open(pdf_path) as pdf:
+        return join_page_texts(page.extract_text() for page in pdf.pages)
+
+
+def extract_with_pdfminer(pdf_path):
+    """PDFMiner extraction (good for complex PDFs)"""
+    from pdfminer.high_level import extract_text as pdfminer_extract_text
+
+    return pdfminer_extract_text(str(pdf_path))
+
+
+def extract_with_pypdf2(pdf_path):
+    """PyPDF2 extraction (lightweight fallback)"""
+    import PyPDF2
+
+    with open(pdf_path, "rb") as file:
+        reader = PyPDF2.PdfReader(file)
+        return join_page_texts(page.extract_text() for page in reader.pages)
+
+
+def render_page_image(page):
+    """Render a page as a grayscale PIL image straight from the pixel buffer"""
+    from PIL import Image
+
+    # Grayscale at 2x zoom: Tesseract binarizes anyway, and no PNG round trip
+    pix = page.get_pixmap(matrix=fitz.Matrix(2, 2), colorspace=fitz.csGRAY, alpha=False)
+    return Image.frombuffer(
+        "L", (pix.width, pix.height), pix.samples, "raw", "L", pix.stride, 1
+    )
+
+
+def ocr_page_image(img):
+    """OCR one rendered page image"""
+    import pytesseract
+
+    return pytesseract.image_to_string(img, lang="eng")
+
+
+# Threads OCRing the pages of one document; None uses every available CPU
+OCR_WORKERS = None
+
+
+def limit_ocr_workers(workers):
+    """Cap the OCR threads per document, e.g. in each PDF worker process"""
+    global OCR_WORKERS
+    OCR_WORKERS = workers
+    # Tesseract subprocesses inherit this; unset, each spreads over every CPU
+    os.environ["OMP_THREAD_LIMIT"] = str(workers)
+
+
+def extract_with_ocr(doc, max_pages=5):
+    """Tesseract OCR of the first pages of an open document (for scanned PDFs)"""
+    print(f"   🔍 Attempting OCR extraction (this may take longer)...")
+
+    # Render serially, a PyMuPDF document must not be shared across threads
+    images = [
+        render_page_image(doc.load_page(page_num))
+        for page_num in range(min(max_pages, len(doc)))
+    ]
+
+    # Each page is OCRed by its own tesseract subprocess, so threads overlap them
+    workers = max(1, min(len(images), OCR_WORKERS or available_cpus()))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        ocr_texts = list(pool.map(ocr_page_image, images))
+
+    return "\n".join(
+        f"=== PAGE {page_num} (OCR) ===\n{ocr_text}"
+        for page_num, ocr_text in enumerate(ocr_texts, 1)
+        if ocr_text and ocr_text.strip()
+    )
+
+
+def text_extractors(pdf_path, doc, robust=True):
+    """Extraction methods in the order they are tried, OCR last
+
+    The PyMuPDF methods share the already open ``doc`` and are left out when
+    PyMuPDF could not open the file. Without ``robust`` only PyMuPDF is used.
+    """
+    if not robust:
+        return [] if doc is None else [("PyMuPDF", partial(extract_with_pymupdf, doc))]
+
+    path_extractors = [
+        ("pdfplumber", partial(extract_with_pdfplumber, pdf_path)),
+        ("PDFMiner", partial(extract_with_pdfminer, pdf_path)),
+        ("PyPDF2", partial(extract_with_pypdf2, pdf_path)),
+    ]
+    if doc is None:
+        return path_extractors
+    return [
+        ("PyMuPDF", partial(extract_with_pymupdf, doc)),
+        *path_extractors,
+        ("OCR", partial(extract_with_ocr, doc)),
+    ]
+
+
+def is_scanned_pdf(doc, probe_pages=3):
+    """Whether the document looks image-only: no text layer but embedded images
+
+    Looks at the first few pages rather than just the first so a scanned
+    cover page in front of a text document does not send it to OCR.
+    """
     try:
-        print(f"   🔍 Attempting OCR extraction (this may take longer)...")
-        doc = fitz.open(pdf_path)
-        text_parts = []
+        pages = [doc.load_page(n) for n in range(min(probe_pages, len(doc)))]
+        has_text = any(len(page.get_text("text").strip()) >= 20 for page in pages)
+        return bool(pages) and not has_text and bool(pages[0].get_images())
+    except Exception:
+        return False
 
-        for page_num in range(min(5, len(doc))):  # Limit to first 5 pages for OCR
-            page = doc.load_page(page_num)
-            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # Higher resolution
-            img_data = pix.tobytes("png")
-            img = Image.open(io.BytesIO(img_data))
 
-            # OCR the image
-            ocr_text = pytesseract.image_to_string(img, lang="eng")
-            if ocr_text and ocr_text.strip():
-                text_parts.append(f"=== PAGE {page_num + 1} (OCR) ===\n{ocr_text}")
+def extract_text_from_pdf(pdf_path, robust=True):
+    """PDF text extraction, robust with multiple methods and OCR fallback
 
-        doc.close()
-        full_text = "\n".join(text_parts)
+    ``robust=False`` is the fast mode: PyMuPDF only, failing instead of
+    falling back. Runs synchronously so it can be dispatched to a process pool.
+    """
 
-        if len(full_text.strip()) > 100:
-            print(f"   ✅ OCR extraction successful: {len(full_text)} chars")
-            return full_text
-        else:
-            print(f"   ⚠️  OCR extracted minimal text: {len(full_text)} chars")
+    if robust:
+        print(f"   🔍 Trying multiple extraction methods for {pdf_path.name}")
+    else:
+        print(f"   🔍 Extracting text with PyMuPDF for {pdf_path.name}")
 
+    # Opened once and shared by the probe, PyMuPDF extraction and OCR
+    try:
+        doc = fitz.open(pdf_path)
     except Exception as e:
-        print(f"   ❌ OCR failed: {e}")
+        print(f"   ❌ PyMuPDF failed: {e}")
+        doc = None
+
+    with nullcontext() if doc is None else doc:
+        extractors = text_extractors(pdf_path, doc, robust)
+        if robust and doc is not None and is_scanned_pdf(doc):
+            # The text extractors cannot recover anything from a scan
+            print(f"   🖼️  No text layer found, going straight to OCR")
+            extractors = extractors[-1:]
+
+        for name, extractor in extractors:
+            try:
+                full_text = extractor()
+            except Exception as e:
+                print(f"   ❌ {name} failed: {e}")
+                continue
+
+            if len(full_text.strip()) > 100:  # Good extraction
+                print(f"   ✅ {name} extraction successful: {len(full_text)} chars")
+                return full_text
+            print(f"   ⚠️  {name} extracted minimal text: {len(full_text)} chars")
 
     # If all methods fail
     print(f"   ❌ All extraction methods failed for {pdf_path.name}")
     raise Exception("All extraction methods failed")
 
 
-async def extract_paper_info(text, filename, max_retries=3):
-    """Extract structured information with retry logic"""
-
-    json_schema = {
-        "type": "object",
-        "properties": {
-            "title": {"type": "string", "description": "Paper title"},
-            "abstract": {"type": "string", "description": "Paper abstract"},
-            "method": {"type": "string", "description": "Proposed method"},
-            "objectives": {"type": "string", "description": "Research objectives"},
-            "categories": {
-                "type": "array",
-                "items": {"type": "string"},
-                "description": "Keywords from abstract",
-            },
-            "summary": {
-                "type": "string",
-                "description": "Comprehensive summary covering: problem addressed, main contributions, methodology, key findings, practical applications, significance, and future implications. Include technical details, algorithms, datasets, performance metrics (300-500 words).",
-            },
+def file_sha256(path):
+    """SHA-256 of a file, hashed through a memory map instead of a bytes copy"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return hashlib.sha256(mm).hexdigest()
+
+
+def extract_text_cached(pdf_path, robust=True):
+    """Extract text from a PDF, reusing earlier results for identical files
+
+    Both modes share the cache: a fast extraction is only stored when it
+    succeeds, and then matches what the robust cascade returns first.
+    """
+    key = f"{file_sha256(pdf_path)}-v{EXTRACTION_VERSION}.txt"
+    text = read_cache("text", key)
+    if text is None:
+        text = extract_text_from_pdf(pdf_path, robust)
+        write_cache("text", key, text)
+    else:
+        print(f"   ♻️  Using cached text for {pdf_path.name}")
+    return text
+
+
+def paper_messages(text):
+    """Chat messages asking for the structured information of one paper"""
+    return [
+        SYSTEM_MESSAGE,
+        {
+            "role": "user",
+            "content": f"Extract paper information from: {text}",
         },
-        "required": [
-            "title",
-            "abstract",
-            "method",
-            "objectives",
-            "categories",
-            "summary",
-        ],
-        "additionalProperties": False,
-    }
+    ]
+
+
+def retry_delay(attempt):
+    """Exponential backoff with full jitter
+
+    Concurrent requests that fail together, e.g. on a rate limit, spread
+    their retries out instead of all retrying at the same moment.
+    """
+    return random.uniform(0, 2 ** (attempt + 1))
+
+
+async def extract_paper_info(text, filename, max_retries=3, limiter=None):
+    """Extract structured information with retry logic, returned as a dict
+
+    With a ``limiter``, each attempt first waits for room in its budget.
+    """
+
+    # Tokenized once, not on every attempt
+    request_tokens = count_tokens(text) + MAX_OUTPUT_TOKENS if limiter else 0
+
+    for attempt in range(max_retries):
+        try:
+            if limiter:
+                await limiter.acquire(request_tokens)
+            response = await models.async_client.chat.completions.create(
+                messages=paper_messages(text), **PAPER_REQUEST
+            )
+
+            # Decoded here so a malformed response is retried like any failure
+            return decode_json_object(response.choices[0].message.content)
+
+        except Exception as e:
+            print(f"   ❌ Attempt {attempt + 1} failed for {filename}: {e}")
+            if attempt == max_retries - 1:
+                raise Exception(
+                    f"All {max_retries} attempts failed for {filename}: {e}"
+                )
+            await asyncio.sleep(retry_delay(attempt))
+
+
+async def extract_paper_info_batch(texts, filenames, max_retries=3, limiter=None):
+    """Extract structured information for several papers with one request
+
+    Returns one dict per paper, in the same order as ``texts``.
+    """
+
+    documents = "\n---\n".join(f"[{i}] {text}" for i, text in enumerate(texts, 1))
+    label = ", ".join(filenames)
+    # Asking for more than the model can produce gets the request rejected
+    max_tokens = min(MAX_OUTPUT_TOKENS * len(texts), MODEL_MAX_OUTPUT_TOKENS)
+    request_tokens = count_tokens(documents) + max_tokens if limiter else 0
 
     for attempt in range(max_retries):
         try:
-            response = models.client.chat.completions.create(
-                model="openai/gpt-4o-mini",
+            if limiter:
+                await limiter.acquire(request_tokens)
+            response = await models.async_client.chat.completions.create(
+                model=MODEL,
+                temperature=0,
+                seed=SEED,
+                max_tokens=max_tokens,
                 messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a scientific paper analysis assistant. If information is not available, use empty string for text fields and empty array for categories.",
-                    },
+                    BATCH_SYSTEM_MESSAGE,
                     {
                         "role": "user",
-                        "content": f"Extract paper information from: {text}",  # Increased limit
+                        "content": f"Extract paper information from each of the {len(texts)} documents:\n---\n{documents}",
                     },
                 ],
-                response_format={
-                    "type": "json_schema",
-                    "json_schema": {
-                        "name": "paper_analysis",
-                        "description": "Structured paper information extraction",
-                        "schema": json_schema,
-                        "strict": True,
-                    },
-                },
+                response_format=BATCH_RESPONSE_FORMAT,
             )
 
-            return response.choices[0].message.content
+            content = response.choices[0].message.content
+            papers = decode_json_object(content)["papers"]
+            if len(papers) != len(texts):
+                raise Exception(
+                    f"Expected {len(texts)} papers in response, got {len(papers)}"
+                )
+            return papers
 
         except Exception as e:
-            print(f"   ❌ Attempt {attempt + 1} failed for {filename}: {e}")
+            print(f"   ❌ Attempt {attempt + 1} failed for {label}: {e}")
             if attempt == max_retries - 1:
-                raise Exception(
-                    f"All {max_retries} attempts failed for {filename}: {e}"
-                )
-            await asyncio.sleep(2**attempt)
+                raise Exception(f"All {max_retries} attempts failed for {label}: {e}")
+            await asyncio.sleep(retry_delay(attempt))
+
+
+def write_and_flush(f, data):
+    """Write data to an open file and hand it to the OS immediately"""
+    f.write(data)
+    f.flush()
+
+
+async def collect_record(record, records, sidecar):
+    """Buffer a record for the final Excel write and log it to a JSONL sidecar
+
+    ``sidecar`` is a binary file opened for appending once per run. Each line
+    is flushed as it is written, so results survive a crash before the final
+    Excel write. The write runs in a thread so it never stalls in-flight
+    OpenAI requests.
+    """
+    records.append(record)
+    line = orjson.dumps(asdict(record), option=orjson.OPT_APPEND_NEWLINE)
+    await asyncio.to_thread(write_and_flush, sidecar, line)
+
+
+def read_sidecar(sidecar_path):
+    """Records logged to a JSONL sidecar, skipping a line cut short by a crash"""
+    records = []
+    with open(sidecar_path, "rb") as f:
+        for line in f:
+            try:
+                records.append(PaperRecord(**orjson.loads(line)))
+            except (orjson.JSONDecodeError, TypeError):
+                continue
+    return records
+
+
+def write_parquet(rows, parquet_path):
+    """Mirror workbook rows to Parquet, storing empty cells as nulls like Excel"""
+    columns = zip(*rows) if rows else [()] * len(EXCEL_COLUMNS)
+    table = pa.table(
+        {
+            col: pa.array(
+                [None if value in (None, "") else str(value) for value in values],
+                type=pa.string(),
+            )
+            for col, values in zip(EXCEL_COLUMNS, columns)
+        }
+    )
+    pq.write_table(table, parquet_path, compression="zstd")
+
 
+def flush_records(records, excel_path):
+    """Write all records to Excel in a single pass, keeping rows already saved
 
-async def save_to_excel(record, excel_path):
-    """Save record to Excel file"""
+    Records already in the workbook (same filename and processed_at) are not
+    written again, so replaying a sidecar is safe. A Parquet copy is written
+    next to the workbook for faster analysis reads.
+    """
     try:
-        record["processed_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = []
+        saved = set()
+        categories_index = EXCEL_COLUMNS.index("categories")
+        filename_index = EXCEL_COLUMNS.index("filename")
+        processed_at_index = EXCEL_COLUMNS.index("processed_at")
 
+        # Carry over rows from previous runs, matching them up by header name
         if excel_path.exists():
-            df = pd.read_excel(excel_path)
-            df = pd.concat([df, pd.DataFrame([record])], ignore_index=True)
-        else:
-            df = pd.DataFrame([record])
+            old_wb = load_workbook(excel_path, read_only=True)
+            old_rows = old_wb.active.iter_rows(values_only=True)
+            header = next(old_rows, ())
+            positions = [
+                header.index(col) if col in header else None for col in EXCEL_COLUMNS
+            ]
+            for row in old_rows:
+                row = tuple(
+                    row[i] if i is not None and i < len(row) else None
+                    for i in positions
+                )
+                rows.append(row)
+                saved.add((row[filename_index], row[processed_at_index]))
+            old_wb.close()
+
+        for record in records:
+            if (record.filename, record.processed_at) in saved:
+                continue
+            row = [getattr(record, col) for col in EXCEL_COLUMNS]
+            row[categories_index] = str(row[categories_index])
+            rows.append(tuple(row))
+
+        # Constant memory mode streams each row to disk as it is written. Text
+        # is stored as is, never turned into formulas or hyperlinks
+        wb = xlsxwriter.Workbook(
+            excel_path,
+            {
+                "constant_memory": True,
+                "strings_to_formulas": False,
+                "strings_to_urls": False,
+            },
+        )
+        ws = wb.add_worksheet()
+        ws.write_row(0, 0, EXCEL_COLUMNS)
+        for row_number, row in enumerate(rows, start=1):
+            ws.write_row(row_number, 0, row)
+        wb.close()
 
-        df.to_excel(excel_path, index=False)
+        # Written after the workbook so it is never older than it
+        write_parquet(rows, excel_path.with_suffix(".parquet"))
 
     except Exception as e:
         raise Exception(f"Error saving to Excel: {e}")
 
 
-async def process_single_pdf(pdf_path):
-    """Process a single PDF and return the record with robust extraction"""
+async def extract_text_async(pdf_path, fd_sem=None, executor=None, robust=True):
+    """Extract text in ``executor`` (default thread pool if None)"""
+    loop = asyncio.get_running_loop()
+    async with fd_sem or nullcontext():
+        text = await loop.run_in_executor(
+            executor, extract_prompt_text, pdf_path, robust
+        )
+    if not text.strip():
+        raise Exception("No text extracted")
+    return text
+
+
+def decode_json_object(text):
+    """Decode the first JSON object in text, ignoring any prose around it"""
     try:
-        # Extract text with robust methods
-        text = await extract_text_from_pdf_robust(pdf_path)
-        if not text.strip():
-            raise Exception("No text extracted")
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        pass
+
+    # Slow path: the model wrapped the object in prose
+    start = text.find("{")
+    if start == -1:
+        raise ValueError("No JSON object found in response")
+    obj, _ = JSON_DECODER.raw_decode(text, start)
+    return obj
+
+
+def build_record(info, pdf_path):
+    """Build a record from the model's decoded response"""
+    fields = {name: info[name] for name in PAPER_FIELDS if name in info}
+    return PaperRecord(pdf_path.name, **fields)
+
 
-        # Process with OpenAI (with retry)
-        info_json = await extract_paper_info(text, pdf_path.name)
+# Responses being requested right now, by cache key, so papers with the same
+# text in one run share a single request instead of each sending their own
+INFLIGHT_RESPONSES = {}
 
-        # Parse JSON
-        record = json.loads(info_json)
-        record["filename"] = pdf_path.name
 
+async def record_response(info, pdf_path, cache_key):
+    """(record, error) for a response; cached under cache_key when it is valid"""
+    try:
+        if isinstance(info, Exception):
+            raise info
+        record = build_record(info, pdf_path)
+        # Cache only responses that build a record
+        if cache_key is not None:
+            info_json = orjson.dumps(info).decode()
+            await asyncio.to_thread(write_cache, "openai", cache_key, info_json)
         return record, None
+    except Exception as e:
+        return PaperRecord(pdf_path.name), str(e)
+
+
+async def request_paper_infos(texts, filenames, limiter=None):
+    """One chat completion for a single paper, a combined one for several"""
+    if len(texts) == 1:
+        return [await extract_paper_info(texts[0], filenames[0], limiter=limiter)]
+    return await extract_paper_info_batch(texts, filenames, limiter=limiter)
+
+
+async def process_pdf_group(
+    pdf_paths,
+    api_sem=None,
+    fd_sem=None,
+    executor=None,
+    robust=True,
+    request=request_paper_infos,
+):
+    """Process PDFs with a single OpenAI request, returning (record, error) per PDF
+
+    The optional semaphores cap how many PDFs are open and how many OpenAI
+    requests are in flight at once across concurrently processed groups.
+    Papers whose response is already cached are not sent again, and papers
+    whose text is already being requested wait for that response. The rest
+    go to ``request``, which returns a dict or an exception per paper.
+    """
+    results = [None] * len(pdf_paths)
+    pending = []
+    duplicates = []
+
+    texts = await asyncio.gather(
+        *(
+            extract_text_async(pdf_path, fd_sem, executor, robust)
+            for pdf_path in pdf_paths
+        ),
+        return_exceptions=True,
+    )
+
+    loop = asyncio.get_running_loop()
+    for i, (pdf_path, text) in enumerate(zip(pdf_paths, texts)):
+        if isinstance(text, Exception):
+            results[i] = (PaperRecord(pdf_path.name), str(text))
+            continue
+
+        key = response_cache_key(text)
+        info_json = await asyncio.to_thread(read_cache, "openai", key)
+        if info_json is not None:
+            # Written by orjson.dumps, so never wrapped in prose
+            results[i] = build_record(orjson.loads(info_json), pdf_path), None
+        elif key in INFLIGHT_RESPONSES:
+            duplicates.append((i, INFLIGHT_RESPONSES[key]))
+        else:
+            INFLIGHT_RESPONSES[key] = loop.create_future()
+            pending.append((i, key, text))
 
+    try:
+        if pending:
+            names = [pdf_paths[i].name for i, _, _ in pending]
+            try:
+                # Process with OpenAI (with retry)
+                async with api_sem or nullcontext():
+                    infos = await request([text for _, _, text in pending], names)
+            except Exception as e:
+                infos = [e] * len(pending)
+
+            for (i, key, _), info in zip(pending, infos):
+                results[i] = await record_response(info, pdf_paths[i], key)
+                # Duplicates receive the response, or the exception, as a result
+                INFLIGHT_RESPONSES.pop(key).set_result(info)
+    finally:
+        # Never leave duplicates waiting on a request that was abandoned
+        for _, key, _ in pending:
+            future = INFLIGHT_RESPONSES.pop(key, None)
+            if future is not None:
+                future.set_result(Exception("Request for identical text was cancelled"))
+
+    for i, future in duplicates:
+        info = await future
+        results[i] = await record_response(info, pdf_paths[i], None)
+
+    return results
+
+
+async def process_single_pdf(
+    pdf_path, api_sem=None, fd_sem=None, executor=None, robust=True
+):
+    """Process a single PDF and return the record with robust extraction"""
+    try:
+        results = await process_pdf_group([pdf_path], api_sem, fd_sem, executor, robust)
+        return results[0]
     except Exception as e:
-        # Return clean empty record instead of error messages
-        clean_record = {
-            "filename": pdf_path.name,
-            "title": "",
-            "abstract": "",
-            "method": "",
-            "objectives": "",
-            "categories": [],
-            "summary": "",
-        }
-        return clean_record, str(e)
+        return PaperRecord(pdf_path.name), str(e)
@@ -0,0 +1,54 @@
+import asyncio
+import math
+import time
+
+
+class RateLimiter:
+    """Requests and tokens per minute, shared by concurrent API calls
+
+    Both budgets refill continuously up to one minute's worth. acquire()
+    waits until a call fits, so requests flow at the highest sustainable
+    rate instead of running into 429 responses and backing off. A limit
+    left as None is unlimited.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.max_requests = float(requests_per_minute or math.inf)
+        self.max_tokens = float(tokens_per_minute or math.inf)
+        self.requests = self.max_requests
+        self.tokens = self.max_tokens
+        self.updated = time.monotonic()
+        # Waiters are served in arrival order, so large calls are not starved
+        self.lock = asyncio.Lock()
+
+    def refill(self):
+        """Add the capacity earned since the last update"""
+        now = time.monotonic()
+        minutes = (now - self.updated) / 60
+        self.updated = now
+        # An unlimited budget stays full, and inf * 0 minutes would be nan
+        if self.requests < self.max_requests:
+            self.requests = min(
+                self.max_requests, self.requests + minutes * self.max_requests
+            )
+        if self.tokens < self.max_tokens:
+            self.tokens = min(self.max_tokens, self.tokens + minutes * self.max_tokens)
+
+    async def acquire(self, tokens):
+        """Wait until one request using ``tokens`` tokens fits in both budgets"""
+        # A call larger than the whole budget only has to wait for a full one
+        tokens = min(tokens, self.max_tokens)
+        async with self.lock:
+            while True:
+                self.refill()
+                if self.requests >= 1 and self.tokens >= tokens:
+                    self.requests -= 1
+                    self.tokens -= tokens
+                    return
+
+                # Only a budget that is short adds to the wait
+                wait_minutes = max(
+                    max(1 - self.requests, 0) / self.max_requests,
+                    max(tokens - self.tokens, 0) / self.max_tokens,
+                )
+                await asyncio.sleep(wait_minutes * 60)
@@ -1,14 +1,113 @@
-import json
-import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
 from pathlib import Path
 
+import ahocorasick
+import numpy as np
+import orjson
 import pandas as pd
+import xlsxwriter
+
+from cpus import available_cpus
+from summary_data import parse_categories, read_summary
+
+# Summaries of papers that failed, which are left out of the report
+ERROR_SUMMARY = re.compile("error|failed", re.IGNORECASE)
+
+# Between consecutive summaries in a category's summaries file
+PAPER_SEPARATOR = "\n\n---PAPER SEPARATOR---\n\n"
+
+# Fields of each paper in the categorized output
+PAPER_COLUMNS = [
+    "filename",
+    "title",
+    "abstract",
+    "method",
+    "objectives",
+    "summary",
+    "categories",
+    "processed_at",
+]
+
+
+def parse_paper_categories(cats):
+    """Parse a categories cell into a list of categories, empty when blank"""
+    if pd.isna(cats):
+        return []
+    return parse_categories(str(cats))
+
+
+def excel_cell(value):
+    """Cell value as pandas would write it: lists as text, missing values blank"""
+    if isinstance(value, list):
+        return str(value)
+    return None if pd.isna(value) else value
+
+
+def write_papers_xlsx(excel_file, papers):
+    """Write papers to a workbook row by row, without pandas' Excel formatter"""
+    # Rows go straight to disk; a title like "=..." or "http..." stays text
+    wb = xlsxwriter.Workbook(
+        excel_file,
+        {
+            "constant_memory": True,
+            "strings_to_formulas": False,
+            "strings_to_urls": False,
+        },
+    )
+    ws = wb.add_worksheet()
+    ws.write_row(0, 0, PAPER_COLUMNS)
+    paper_row = itemgetter(*PAPER_COLUMNS)
+    for row_number, paper in enumerate(papers, start=1):
+        ws.write_row(row_number, 0, list(map(excel_cell, paper_row(paper))))
+    wb.close()
+
+
+def keyword_automaton(categories):
+    """Aho-Corasick automaton finding every category keyword in one pass
+
+    Returns the automaton, which maps each keyword to its row number, and a
+    (keywords x categories) matrix counting how often each category lists
+    that keyword. Keywords are lowercased here, once, to match the
+    lowercased paper text.
+    """
+    keyword_rows = {}
+    for cat_info in categories.values():
+        for keyword in cat_info["keywords"]:
+            keyword_rows.setdefault(keyword.lower(), len(keyword_rows))
+
+    keyword_categories = np.zeros((len(keyword_rows), len(categories)), dtype=int)
+    for cat_index, cat_info in enumerate(categories.values()):
+        for keyword in cat_info["keywords"]:
+            keyword_categories[keyword_rows[keyword.lower()], cat_index] += 1
+
+    automaton = ahocorasick.Automaton()
+    for keyword, row in keyword_rows.items():
+        automaton.add_word(keyword, row)
+    automaton.make_automaton()
+    return automaton, keyword_categories
+
+
+def keyword_matches(texts, automaton, keyword_categories):
+    """Matrix of how many keywords of each category (columns) every text contains"""
+    # Papers often share a text, such as the same category list, so each
+    # distinct text is matched once and its counts copied to every paper
+    codes, unique_texts = pd.factorize(texts)
+
+    # A keyword counts once per text, however often it occurs
+    found = np.zeros((len(unique_texts), len(keyword_categories)), dtype=int)
+    for row, text in enumerate(unique_texts):
+        found[row, [keyword for _, keyword in automaton.iter(text)]] = 1
+
+    # Category scores straight from keyword hits, without a loop over categories
+    return (found @ keyword_categories)[codes]
 
 
 def categorize_papers_for_report(excel_file="batch_papers_summary.xlsx"):
     """Categorize papers into main research areas and prepare for report generation"""
 
-    df = pd.read_excel(excel_file)
+    df = read_summary(excel_file, columns=PAPER_COLUMNS)
 
     # Define the 4 main categories based on analysis
     categories = {
@@ -93,102 +192,61 @@ def categorize_papers_for_report(excel_file="batch_papers_summary.xlsx"):
     print("🔍 CATEGORIZING PAPERS FOR 40-PAGE REPORT")
     print("=" * 60)
 
-    # Categorize each paper
-    uncategorized_papers = []
-
-    for idx, row in df.iterrows():
-        # Skip error papers
-        if (
-            pd.isna(row["summary"])
-            or "error" in str(row["summary"]).lower()
-            or "failed" in str(row["summary"]).lower()
-        ):
-            continue
-
-        paper_categories = []
-        if pd.notna(row["categories"]):
-            try:
-                if str(row["categories"]).startswith("["):
-                    paper_categories = eval(row["categories"])
-                else:
-                    paper_categories = [row["categories"]]
-            except:
-                paper_categories = [str(row["categories"])]
-
-        # Convert to lowercase for matching
-        paper_cats_lower = [str(cat).lower() for cat in paper_categories]
-
-        # Find best matching category
-        best_match = None
-        max_matches = 0
-
-        for cat_key, cat_info in categories.items():
-            matches = 0
-            for keyword in cat_info["keywords"]:
-                for paper_cat in paper_cats_lower:
-                    if keyword in paper_cat:
-                        matches += 1
-                        break
-
-            if matches > max_matches:
-                max_matches = matches
-                best_match = cat_key
-
-        # If no good match found, try title/abstract
-        if max_matches == 0:
-            text_to_search = f"{str(row['title'])} {str(row['abstract'])} {str(row['method'])}".lower()
-
-            for cat_key, cat_info in categories.items():
-                matches = 0
-                for keyword in cat_info["keywords"]:
-                    if keyword in text_to_search:
-                        matches += 1
-
-                if matches > max_matches:
-                    max_matches = matches
-                    best_match = cat_key
-
-        # Assign to category
-        if best_match and max_matches > 0:
-            categories[best_match]["papers"].append(
-                {
-                    "filename": row["filename"],
-                    "title": row["title"],
-                    "abstract": row["abstract"],
-                    "method": row["method"],
-                    "objectives": row["objectives"],
-                    "summary": row["summary"],
-                    "categories": paper_categories,
-                    "processed_at": row["processed_at"],
-                }
-            )
-        else:
-            # Default to Industry Applications if no clear match
-            categories["4_Industry_Applications"]["papers"].append(
-                {
-                    "filename": row["filename"],
-                    "title": row["title"],
-                    "abstract": row["abstract"],
-                    "method": row["method"],
-                    "objectives": row["objectives"],
-                    "summary": row["summary"],
-                    "categories": paper_categories,
-                    "processed_at": row["processed_at"],
-                }
-            )
+    # Skip error papers and papers without a summary, in one regex pass
+    summaries = df["summary"].astype("string")
+    papers = df[~summaries.str.contains(ERROR_SUMMARY, na=True)].copy()
+
+    # Papers often share a categories cell, so each distinct cell is parsed
+    # and lowercased once and papers refer to it by code
+    codes, cells = pd.factorize(papers["categories"], use_na_sentinel=False)
+    cell_categories = [parse_paper_categories(cell) for cell in cells]
+    papers["categories"] = [cell_categories[code] for code in codes]
+
+    # Keywords never span the newlines between categories, so a keyword is in
+    # the joined text if it is in one of them
+    cell_cats_lower = pd.Series(
+        ["\n".join(map(str, cats)) for cats in cell_categories], dtype="string"
+    ).str.lower()
+
+    # Find best matching category, the first one on a tie
+    automaton, keyword_categories = keyword_automaton(categories)
+    matches = keyword_matches(cell_cats_lower, automaton, keyword_categories)[codes]
+
+    # If no good match found, try title/abstract, building the text only for
+    # the papers that need it
+    no_match = matches.max(axis=1) == 0
+    fallback = papers.loc[no_match, ["title", "abstract", "method"]].astype("string")
+    text_to_search = (
+        fallback["title"]
+        .str.cat([fallback["abstract"], fallback["method"]], sep=" ", na_rep="")
+        .str.lower()
+    )
+    matches[no_match] = keyword_matches(text_to_search, automaton, keyword_categories)
+
+    # Default to Industry Applications if no clear match
+    cat_keys = list(categories)
+    best_match = np.where(
+        matches.max(axis=1) > 0,
+        matches.argmax(axis=1),
+        cat_keys.index("4_Industry_Applications"),
+    )
+
+    # Assign to category, grouping on the category index itself
+    for cat_index, cat_papers in papers[PAPER_COLUMNS].groupby(best_match, sort=False):
+        categories[cat_keys[cat_index]]["papers"] = cat_papers.to_dict(orient="records")
 
     # Print categorization results
     print(f"📊 CATEGORIZATION RESULTS:")
     print("-" * 40)
-    total_papers = 0
 
-    for cat_key, cat_info in categories.items():
-        count = len(cat_info["papers"])
-        total_papers += count
-        percentage = (count / len(df)) * 100
+    # Share of all rows in the summary, error papers included
+    counts = np.bincount(best_match, minlength=len(cat_keys))
+    percentages = counts / len(df) * 100
+
+    for cat_info, count, percentage in zip(categories.values(), counts, percentages):
         print(f"{cat_info['name']:<40} | {count:3d} papers ({percentage:4.1f}%)")
 
-    print(f"\nTotal categorized papers: {total_papers}")
+    print(f"\nTotal categorized papers: {counts.sum()}")
 
     # Save categorized papers to separate files
     output_dir = Path("categorized_papers")
@@ -198,43 +256,46 @@ def categorize_papers_for_report(excel_file="batch_papers_summary.xlsx"):
     print("-" * 40)
 
     category_summaries = {}
+    workbooks = {}
 
     for cat_key, cat_info in categories.items():
         if cat_info["papers"]:
             # Save to JSON for processing
+            # Encoded in one call and written in one go; missing values as null
             json_file = output_dir / f"{cat_key}.json"
-            with open(json_file, "w", encoding="utf-8") as f:
-                json.dump(
+            json_file.write_bytes(
+                orjson.dumps(
                     {
                         "category_name": cat_info["name"],
                         "description": cat_info["description"],
                         "paper_count": len(cat_info["papers"]),
                         "papers": cat_info["papers"],
                     },
-                    f,
-                    indent=2,
-                    ensure_ascii=False,
+                    option=orjson.OPT_INDENT_2,
                 )
+            )
 
-            # Save to Excel for easy viewing
+            # Save to Excel for easy viewing, written below
             excel_file = output_dir / f"{cat_key}.xlsx"
-            cat_df = pd.DataFrame(cat_info["papers"])
-            cat_df.to_excel(excel_file, index=False)
+            workbooks[excel_file] = cat_info["papers"]
 
             # Extract all summaries for this category
-            summaries = [
+            summaries = (
                 paper["summary"] for paper in cat_info["papers"] if paper["summary"]
-            ]
-            combined_summary = "\n\n---PAPER SEPARATOR---\n\n".join(summaries)
+            )
 
-            # Save combined summaries
+            # Save combined summaries, streamed through the file buffer instead
+            # of joining every summary into one more copy in memory
             summary_file = output_dir / f"{cat_key}_summaries.txt"
             with open(summary_file, "w", encoding="utf-8") as f:
-                f.write(f"CATEGORY: {cat_info['name']}\n")
-                f.write(f"DESCRIPTION: {cat_info['description']}\n")
-                f.write(f"TOTAL PAPERS: {len(cat_info['papers'])}\n")
-                f.write("=" * 80 + "\n\n")
-                f.write(combined_summary)
+                f.write(
+                    f"CATEGORY: {cat_info['name']}\n"
+                    f"DESCRIPTION: {cat_info['description']}\n"
+                    f"TOTAL PAPERS: {len(cat_info['papers'])}\n"
+                    f"{'=' * 80}\n\n"
+                )
+                for i, summary in enumerate(summaries):
+                    f.write(f"{PAPER_SEPARATOR}{summary}" if i else summary)
 
             category_summaries[cat_key] = {
                 "name": cat_info["name"],
@@ -248,6 +309,16 @@ def categorize_papers_for_report(excel_file="batch_papers_summary.xlsx"):
                 f"   📁 Files: {json_file.name}, {excel_file.name}, {summary_file.name}"
             )
 
+    # Writing workbooks is most of the run time and pure Python, so write
+    # them side by side in worker processes when there is more than one CPU
+    workers = min(len(workbooks), available_cpus())
+    if workers == 1:
+        for excel_file, papers in workbooks.items():
+            write_papers_xlsx(excel_file, papers)
+    elif workbooks:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(write_papers_xlsx, workbooks, workbooks.values()))
+
     # Generate base prompt for report writing
     generate_report_prompts(category_summaries)
 
@@ -367,9 +438,9 @@ You will receive the summaries of all {cat_info['paper_count']} papers in this c
 **Remember:** This is Section {i} of a 4-section report. Ensure it flows well with the overall report structure while being self-contained and comprehensive.
 """
 
-        section_file = (
-            prompts_dir / f"{cat_key.split('_')[0]}_{cat_key.split('_')[1]}_prompt.txt"
-        )
+        # "1_Scheduling_Optimization" -> "1_Scheduling_prompt.txt"
+        section_number, section_name = cat_key.split("_")[:2]
+        section_file = prompts_dir / f"{section_number}_{section_name}_prompt.txt"
         with open(section_file, "w", encoding="utf-8") as f:
             f.write(section_prompt)
 
@@ -427,5 +498,3 @@ You will receive the summaries of all {cat_info['paper_count']} papers in this c
 
 if __name__ == "__main__":
     categories = categorize_papers_for_report()
-if __name__ == "__main__":
-    categories = categorize_papers_for_report()
@@ -0,0 +1,40 @@
+import ast
+from pathlib import Path
+
+import pandas as pd
+
+
+def summary_exists(excel_file="batch_papers_summary.xlsx"):
+    """Whether the paper summary exists as a workbook or a Parquet copy"""
+    excel_path = Path(excel_file)
+    return excel_path.exists() or excel_path.with_suffix(".parquet").exists()
+
+
+def read_summary(excel_file="batch_papers_summary.xlsx", columns=None):
+    """Load the paper summary, preferring the Parquet copy written alongside it
+
+    The Parquet file is only used when it is at least as new as the workbook,
+    so manual edits to the Excel file are never silently ignored. Pass
+    ``columns`` to load only the columns that are needed.
+    """
+    excel_path = Path(excel_file)
+    parquet_path = excel_path.with_suffix(".parquet")
+
+    if parquet_path.exists() and (
+        not excel_path.exists()
+        or parquet_path.stat().st_mtime >= excel_path.stat().st_mtime
+    ):
+        return pd.read_parquet(parquet_path, columns=columns)
+
+    # calamine parses the workbook in Rust, several times faster than openpyxl
+    return pd.read_excel(excel_path, usecols=columns, engine="calamine")
+
+
+def parse_categories(cats):
+    """Parse a categories cell, either a list literal or a single category"""
+    if cats.startswith("["):
+        try:
+            return ast.literal_eval(cats)
+        except (ValueError, SyntaxError):
+            pass
+    return [cats]